@@ -2,7 +2,6 @@ import logging
 from dataclasses import dataclass
 from typing import Optional
 
-from bitstring import BitArray
 from blspy import G1Element, AugSchemeMPL, PrivateKey
 from chiapos import Verifier
 
@@ -76,10 +75,10 @@ class ProofOfSpace(Streamable):
         challenge_hash: bytes32,
         signage_point: bytes32,
     ) -> bool:
-        plot_filter: BitArray = BitArray(
-            ProofOfSpace.calculate_plot_filter_input(plot_id, challenge_hash, signage_point)
+        plot_filter: int = int.from_bytes(
+            ProofOfSpace.calculate_plot_filter_input(plot_id, challenge_hash, signage_point), "big"
         )
-        return plot_filter[: constants.NUMBER_ZERO_BITS_PLOT_FILTER].uint == 0
+        return plot_filter >> (256 - constants.NUMBER_ZERO_BITS_PLOT_FILTER) == 0
 
     @staticmethod
     def calculate_plot_filter_input(plot_id: bytes32, challenge_hash: bytes32, signage_point: bytes32) -> bytes32:
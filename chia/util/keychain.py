@@ -1,19 +1,27 @@
+import base64
 import unicodedata
-from hashlib import pbkdf2_hmac
+from hashlib import sha256
 from secrets import token_bytes
 from sys import platform
-from typing import List, Optional, Tuple
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
 
 import keyring as keyring_main
 import pkg_resources
-from bitstring import BitArray
 from blspy import AugSchemeMPL, G1Element, PrivateKey
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from keyrings.cryptfile.cryptfile import CryptFileKeyring
 
-from chia.util.hash import std_hash
-
 MAX_KEYS = 100
 
+_T = TypeVar("_T")
+
+# Keychain entries are written as hex. Entries may also be this prefix followed by the base64 encoded
+# public key and entropy, which is readable but not yet written: releases without the base64 read path
+# would fail every scan on such an entry. Hex never contains a ':'.
+_KEY_STR_PREFIX = "b64:"
+
 if platform == "win32" or platform == "cygwin":
     import keyring.backends.Windows
 
@@ -29,10 +37,47 @@ else:
     keyring = keyring_main
 
 
+def _encode_key_str(pk_bytes: bytes, entropy: bytes) -> str:
+    """
+    Encodes a public key and its entropy in the compact base64 form. add_private_key does not use
+    this yet; it keeps writing hex until releases that can read base64 entries have shipped.
+    """
+    return _KEY_STR_PREFIX + base64.b64encode(pk_bytes + entropy).decode()
+
+
+def _decode_key_str(key_str: str, num_bytes: Optional[int] = None) -> bytes:
+    """
+    Decodes a hex keyring entry, or a base64 entry produced by _encode_key_str. If num_bytes is
+    given, only enough of the entry to produce the first num_bytes bytes is decoded.
+    """
+    if key_str.startswith(_KEY_STR_PREFIX):
+        encoded = key_str[len(_KEY_STR_PREFIX) :]
+        if num_bytes is not None:
+            # base64 encodes every 3 bytes as 4 characters
+            encoded = encoded[: -(-num_bytes // 3) * 4]
+        return base64.b64decode(encoded)[:num_bytes]
+    if num_bytes is not None:
+        key_str = key_str[: num_bytes * 2]
+    return bytes.fromhex(key_str)
+
+
 def bip39_word_list() -> str:
     return pkg_resources.resource_string(__name__, "english.txt").decode()
 
 
+# The word list never changes, so it is parsed once at import time rather than on every conversion
+_WORD_LIST: Tuple[str, ...] = tuple(bip39_word_list().splitlines())
+_WORD_INDEX: Dict[str, int] = {word: i for i, word in enumerate(_WORD_LIST)}
+
+
+def _mnemonic_checksum(entropy: bytes, checksum_bits: int) -> int:
+    """
+    Returns the BIP39 checksum, the first checksum_bits bits of sha256(entropy). There are at most
+    8 checksum bits, so they always come from the first byte of the digest.
+    """
+    return sha256(entropy).digest()[0] >> (8 - checksum_bits)
+
+
 def generate_mnemonic() -> str:
     mnemonic_bytes = token_bytes(32)
     mnemonic = bytes_to_mnemonic(mnemonic_bytes)
@@ -44,22 +89,17 @@ def bytes_to_mnemonic(mnemonic_bytes: bytes) -> str:
         raise ValueError(
             f"Data length should be one of the following: [16, 20, 24, 28, 32], but it is {len(mnemonic_bytes)}."
         )
-    word_list = bip39_word_list().splitlines()
     CS = len(mnemonic_bytes) // 4
+    total_bits = len(mnemonic_bytes) * 8 + CS
+    assert total_bits % 11 == 0
 
-    checksum = BitArray(bytes(std_hash(mnemonic_bytes)))[:CS]
+    checksum = _mnemonic_checksum(mnemonic_bytes, CS)
+    bits = (int.from_bytes(mnemonic_bytes, "big") << CS) | checksum
 
-    bitarray = BitArray(mnemonic_bytes) + checksum
     mnemonics = []
-    assert len(bitarray) % 11 == 0
-
-    for i in range(0, len(bitarray) // 11):
-        start = i * 11
-        end = start + 11
-        bits = bitarray[start:end]
-        m_word_position = bits.uint
-        m_word = word_list[m_word_position]
-        mnemonics.append(m_word)
+    for shift in range(total_bits - 11, -1, -11):
+        m_word_position = (bits >> shift) & 0x7FF
+        mnemonics.append(_WORD_LIST[m_word_position])
 
     return " ".join(mnemonics)
 
@@ -69,40 +109,44 @@ def bytes_from_mnemonic(mnemonic_str: str) -> bytes:
     if len(mnemonic) not in [12, 15, 18, 21, 24]:
         raise ValueError("Invalid mnemonic length")
 
-    word_list = {word: i for i, word in enumerate(bip39_word_list().splitlines())}
-    bit_array = BitArray()
-    for i in range(0, len(mnemonic)):
-        word = mnemonic[i]
-        if word not in word_list:
+    bits = 0
+    for word in mnemonic:
+        if word not in _WORD_INDEX:
             raise ValueError(f"'{word}' is not in the mnemonic dictionary; may be misspelled")
-        value = word_list[word]
-        bit_array.append(BitArray(uint=value, length=11))
+        bits = (bits << 11) | _WORD_INDEX[word]
 
     CS: int = len(mnemonic) // 3
     ENT: int = len(mnemonic) * 11 - CS
-    assert len(bit_array) == len(mnemonic) * 11
     assert ENT % 32 == 0
 
-    entropy_bytes = bit_array[:ENT].bytes
-    checksum_bytes = bit_array[ENT:]
-    checksum = BitArray(std_hash(entropy_bytes))[:CS]
+    entropy_bytes = (bits >> CS).to_bytes(ENT // 8, "big")
+    checksum_bits = bits & ((1 << CS) - 1)
+    checksum = _mnemonic_checksum(entropy_bytes, CS)
 
-    assert len(checksum_bytes) == CS
-
-    if checksum != checksum_bytes:
+    if checksum != checksum_bits:
         raise ValueError("Invalid order of mnemonic words")
 
     return entropy_bytes
 
 
+def _nfkd_utf8(s: str) -> bytes:
+    """
+    NFKD normalizes and UTF-8 encodes a string. ASCII strings are unchanged by NFKD, so
+    they skip the normalization, which covers English mnemonics and most passphrases.
+    """
+    if s.isascii():
+        return s.encode("ascii")
+    return unicodedata.normalize("NFKD", s).encode("utf-8")
+
+
 def mnemonic_to_seed(mnemonic: str, passphrase: str) -> bytes:
     """
     Uses BIP39 standard to derive a seed from entropy bytes.
     """
-    salt_str: str = "mnemonic" + passphrase
-    salt = unicodedata.normalize("NFKD", salt_str).encode("utf-8")
-    mnemonic_normalized = unicodedata.normalize("NFKD", mnemonic).encode("utf-8")
-    seed = pbkdf2_hmac("sha512", mnemonic_normalized, salt, 2048)
+    salt = _nfkd_utf8("mnemonic" + passphrase)
+    mnemonic_normalized = _nfkd_utf8(mnemonic)
+    kdf = PBKDF2HMAC(algorithm=hashes.SHA512(), length=64, salt=salt, iterations=2048, backend=default_backend())
+    seed = kdf.derive(mnemonic_normalized)
 
     assert len(seed) == 64
     return seed
@@ -121,19 +165,34 @@ class Keychain:
 
     testing: bool
     user: str
+    _service: str
+    _user_prefix: str
 
     def __init__(self, user: str = "user-chia-1.8", testing: bool = False):
         self.testing = testing
         self.user = user
+        if testing:
+            self._service = f"chia-{user}-test"
+            self._user_prefix = f"wallet-{user}-test-"
+        else:
+            self._service = f"chia-{user}"
+            self._user_prefix = f"wallet-{user}-"
 
     def _get_service(self) -> str:
         """
         The keychain stores keys under a different name for tests.
         """
-        if self.testing:
-            return f"chia-{self.user}-test"
-        else:
-            return f"chia-{self.user}"
+        return self._service
+
+    def _get_key_str(self, user: str) -> Optional[str]:
+        """
+        Returns the raw keychain entry for a specific 'user' (key index), or None if the
+        slot is empty.
+        """
+        read_str = keyring.get_password(self._get_service(), user)
+        if read_str is None or len(read_str) == 0:
+            return None
+        return read_str
 
     def _get_pk_and_entropy(self, user: str) -> Optional[Tuple[G1Element, bytes]]:
         """
@@ -141,35 +200,63 @@ class Keychain:
         include an G1Element and the entropy required to generate the private key.
         Note that generating the actual private key also requires the passphrase.
         """
-        read_str = keyring.get_password(self._get_service(), user)
-        if read_str is None or len(read_str) == 0:
+        read_str = self._get_key_str(user)
+        if read_str is None:
             return None
-        str_bytes = bytes.fromhex(read_str)
+        str_bytes = _decode_key_str(read_str)
         return (
             G1Element.from_bytes(str_bytes[: G1Element.SIZE]),
             str_bytes[G1Element.SIZE :],  # flake8: noqa
         )
 
+    def _get_pk_only(self, user: str) -> Optional[G1Element]:
+        """
+        Returns only the G1Element stored for a specific 'user' (key index), without
+        decoding the entropy that follows it.
+        """
+        read_str = self._get_key_str(user)
+        if read_str is None:
+            return None
+        return G1Element.from_bytes(_decode_key_str(read_str, G1Element.SIZE))
+
     def _get_private_key_user(self, index: int) -> str:
         """
         Returns the keychain user string for a key index.
         """
-        if self.testing:
-            return f"wallet-{self.user}-test-{index}"
-        else:
-            return f"wallet-{self.user}-{index}"
+        return f"{self._user_prefix}{index}"
+
+    def _scan(self, read_slot: Callable[[str], Optional[_T]]) -> Iterator[Tuple[int, Optional[_T]]]:
+        """
+        Yields the index and the contents read by read_slot for every slot in the keychain,
+        including empty ones (None). Each slot is read from the keyring exactly once. Slots are
+        not guaranteed to be contiguous: delete_key_by_fingerprint frees a slot in place, so
+        scans have to continue past empty slots up to MAX_KEYS.
+        """
+        for index in range(MAX_KEYS + 1):
+            yield index, read_slot(self._get_private_key_user(index))
+
+    def _iter_stored_keys(self) -> Iterator[Tuple[int, G1Element, bytes]]:
+        """
+        Yields the index, public key and entropy of every populated slot in the keychain.
+        """
+        for index, pkent in self._scan(self._get_pk_and_entropy):
+            if pkent is not None:
+                yield index, pkent[0], pkent[1]
+
+    def _iter_stored_public_keys(self) -> Iterator[Tuple[int, G1Element]]:
+        """
+        Like _iter_stored_keys, for callers that only need the public keys.
+        """
+        for index, pk in self._scan(self._get_pk_only):
+            if pk is not None:
+                yield index, pk
 
     def _get_free_private_key_index(self) -> int:
         """
-        Get the index of the first free spot in the keychain.
+        Get the index of the first free spot in the keychain. This may be a gap left by a
+        deleted key, so keys are only contiguous until the first deletion.
         """
-        index = 0
-        while True:
-            pk = self._get_private_key_user(index)
-            pkent = self._get_pk_and_entropy(pk)
-            if pkent is None:
-                return index
-            index += 1
+        return next((index for index, key_str in self._scan(self._get_key_str) if key_str is None), MAX_KEYS + 1)
 
     def add_private_key(self, mnemonic: str, passphrase: str) -> PrivateKey:
         """
@@ -179,14 +266,19 @@ class Keychain:
         """
         seed = mnemonic_to_seed(mnemonic, passphrase)
         entropy = bytes_from_mnemonic(mnemonic)
-        index = self._get_free_private_key_index()
         key = AugSchemeMPL.key_gen(seed)
         fingerprint = key.get_g1().get_fingerprint()
 
-        if fingerprint in [pk.get_fingerprint() for pk in self.get_all_public_keys()]:
+        # Read every slot once and run both the duplicate check and the free slot search on it. This is
+        # not kept between calls, since other processes may change the keyring.
+        stored_keys = dict(self._iter_stored_public_keys())
+        if any(pk.get_fingerprint() == fingerprint for pk in stored_keys.values()):
             # Prevents duplicate add
             return key
 
+        index = 0
+        while index in stored_keys:
+            index += 1
         keyring.set_password(
             self._get_service(),
             self._get_private_key_user(index),
@@ -198,19 +290,13 @@ class Keychain:
         """
         Returns the first key in the keychain that has one of the passed in passphrases.
         """
-        index = 0
-        pkent = self._get_pk_and_entropy(self._get_private_key_user(index))
-        while index <= MAX_KEYS:
-            if pkent is not None:
-                pk, ent = pkent
-                for pp in passphrases:
-                    mnemonic = bytes_to_mnemonic(ent)
-                    seed = mnemonic_to_seed(mnemonic, pp)
-                    key = AugSchemeMPL.key_gen(seed)
-                    if key.get_g1() == pk:
-                        return (key, ent)
-            index += 1
-            pkent = self._get_pk_and_entropy(self._get_private_key_user(index))
+        for _, pk, ent in self._iter_stored_keys():
+            mnemonic = bytes_to_mnemonic(ent)
+            for pp in passphrases:
+                seed = mnemonic_to_seed(mnemonic, pp)
+                key = AugSchemeMPL.key_gen(seed)
+                if key.get_g1() == pk:
+                    return (key, ent)
         return None
 
     def get_private_key_by_fingerprint(
@@ -219,19 +305,16 @@ class Keychain:
         """
         Return first private key which have the given public key fingerprint.
         """
-        index = 0
-        pkent = self._get_pk_and_entropy(self._get_private_key_user(index))
-        while index <= MAX_KEYS:
-            if pkent is not None:
-                pk, ent = pkent
-                for pp in passphrases:
-                    mnemonic = bytes_to_mnemonic(ent)
-                    seed = mnemonic_to_seed(mnemonic, pp)
-                    key = AugSchemeMPL.key_gen(seed)
-                    if pk.get_fingerprint() == fingerprint:
-                        return (key, ent)
-            index += 1
-            pkent = self._get_pk_and_entropy(self._get_private_key_user(index))
+        for _, pk, ent in self._iter_stored_keys():
+            # The fingerprint comes from the stored public key, so skip the seed derivation on a mismatch
+            if pk.get_fingerprint() != fingerprint:
+                continue
+            mnemonic = bytes_to_mnemonic(ent)
+            for pp in passphrases:
+                seed = mnemonic_to_seed(mnemonic, pp)
+                key = AugSchemeMPL.key_gen(seed)
+                if key.get_g1() == pk:
+                    return (key, ent)
         return None
 
     def get_all_private_keys(self, passphrases: List[str] = [""]) -> List[Tuple[PrivateKey, bytes]]:
@@ -241,65 +324,44 @@ class Keychain:
         """
         all_keys: List[Tuple[PrivateKey, bytes]] = []
 
-        index = 0
-        pkent = self._get_pk_and_entropy(self._get_private_key_user(index))
-        while index <= MAX_KEYS:
-            if pkent is not None:
-                pk, ent = pkent
-                for pp in passphrases:
-                    mnemonic = bytes_to_mnemonic(ent)
-                    seed = mnemonic_to_seed(mnemonic, pp)
-                    key = AugSchemeMPL.key_gen(seed)
-                    if key.get_g1() == pk:
-                        all_keys.append((key, ent))
-            index += 1
-            pkent = self._get_pk_and_entropy(self._get_private_key_user(index))
+        for _, pk, ent in self._iter_stored_keys():
+            mnemonic = bytes_to_mnemonic(ent)
+            for pp in passphrases:
+                seed = mnemonic_to_seed(mnemonic, pp)
+                # key_gen takes microseconds, much less than dispatching it to a thread pool would cost
+                key = AugSchemeMPL.key_gen(seed)
+                if key.get_g1() == pk:
+                    all_keys.append((key, ent))
         return all_keys
 
+    def iter_public_keys(self) -> Iterator[G1Element]:
+        """
+        Yields the public keys one at a time, so that callers can stop reading the keyring early.
+        """
+        for _, pk in self._iter_stored_public_keys():
+            yield pk
+
     def get_all_public_keys(self) -> List[G1Element]:
         """
         Returns all public keys.
         """
-        all_keys: List[Tuple[G1Element, bytes]] = []
-
-        index = 0
-        pkent = self._get_pk_and_entropy(self._get_private_key_user(index))
-        while index <= MAX_KEYS:
-            if pkent is not None:
-                pk, ent = pkent
-                all_keys.append(pk)
-            index += 1
-            pkent = self._get_pk_and_entropy(self._get_private_key_user(index))
-        return all_keys
+        return list(self.iter_public_keys())
 
     def get_first_public_key(self) -> Optional[G1Element]:
         """
         Returns the first public key.
         """
-        index = 0
-        pkent = self._get_pk_and_entropy(self._get_private_key_user(index))
-        while index <= MAX_KEYS:
-            if pkent is not None:
-                pk, ent = pkent
-                return pk
-            index += 1
-            pkent = self._get_pk_and_entropy(self._get_private_key_user(index))
-        return None
+        return next(self.iter_public_keys(), None)
 
     def delete_key_by_fingerprint(self, fingerprint: int):
         """
-        Deletes all keys which have the given public key fingerprint.
+        Deletes the key which has the given public key fingerprint. add_private_key never stores
+        the same fingerprint twice, so the scan stops at the first match.
         """
-
-        index = 0
-        pkent = self._get_pk_and_entropy(self._get_private_key_user(index))
-        while index <= MAX_KEYS:
-            if pkent is not None:
-                pk, ent = pkent
-                if pk.get_fingerprint() == fingerprint:
-                    keyring.delete_password(self._get_service(), self._get_private_key_user(index))
-            index += 1
-            pkent = self._get_pk_and_entropy(self._get_private_key_user(index))
+        for index, pk in self._iter_stored_public_keys():
+            if pk.get_fingerprint() == fingerprint:
+                keyring.delete_password(self._get_service(), self._get_private_key_user(index))
+                return
 
     def delete_all_keys(self):
         """
@@ -307,35 +369,16 @@ class Keychain:
         """
 
         index = 0
-        delete_exception = False
-        pkent = None
         while True:
+            pkent = None
             try:
                 pkent = self._get_pk_and_entropy(self._get_private_key_user(index))
                 keyring.delete_password(self._get_service(), self._get_private_key_user(index))
             except Exception:
                 # Some platforms might throw on no existing key
-                delete_exception = True
-
-            # Stop when there are no more keys to delete
-            if (pkent is None or delete_exception) and index > MAX_KEYS:
-                break
-            index += 1
-
-        index = 0
-        delete_exception = True
-        pkent = None
-        while True:
-            try:
-                pkent = self._get_pk_and_entropy(
-                    self._get_private_key_user(index)
-                )  # changed from _get_fingerprint_and_entropy to _get_pk_and_entropy - GH
-                keyring.delete_password(self._get_service(), self._get_private_key_user(index))
-            except Exception:
-                # Some platforms might throw on no existing key
-                delete_exception = True
+                pass
 
             # Stop when there are no more keys to delete
-            if (pkent is None or delete_exception) and index > MAX_KEYS:
+            if pkent is None and index > MAX_KEYS:
                 break
             index += 1
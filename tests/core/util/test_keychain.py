@@ -4,7 +4,15 @@ from secrets import token_bytes
 
 from blspy import AugSchemeMPL, PrivateKey
 
-from chia.util.keychain import Keychain, bytes_from_mnemonic, bytes_to_mnemonic, generate_mnemonic, mnemonic_to_seed
+from chia.util.keychain import (
+    Keychain,
+    _encode_key_str,
+    bytes_from_mnemonic,
+    bytes_to_mnemonic,
+    generate_mnemonic,
+    keyring,
+    mnemonic_to_seed,
+)
 
 
 class TesKeychain(unittest.TestCase):
@@ -32,6 +40,14 @@ class TesKeychain(unittest.TestCase):
             " ".join(bad_mnemonic),
         )
 
+        # wrong number of words in the mnemonic
+        self.assertRaisesRegex(
+            ValueError,
+            "Invalid mnemonic length",
+            bytes_from_mnemonic,
+            " ".join(mnemonic.split(" ")[:-1]),
+        )
+
         kc.add_private_key(mnemonic, "")
         assert kc._get_free_private_key_index() == 1
         assert len(kc.get_all_private_keys()) == 1
@@ -71,12 +87,40 @@ class TesKeychain(unittest.TestCase):
 
         assert kc.get_first_private_key() is not None
         assert kc.get_first_private_key(["bad passphrase"]) is None
+
+        third_pk = kc.get_all_public_keys()[2]
+        third_key = kc.get_private_key_by_fingerprint(third_pk.get_fingerprint(), ["", "third passphrase"])
+        assert third_key is not None and third_key[0].get_g1() == third_pk
+        assert kc.get_private_key_by_fingerprint(third_pk.get_fingerprint(), ["bad passphrase"]) is None
         assert kc.get_first_public_key() is not None
 
         kc.delete_all_keys()
         kc.add_private_key(bytes_to_mnemonic(token_bytes(32)), "my passphrase")
         assert kc.get_first_public_key() is not None
 
+    def test_base64_entries(self):
+        kc: Keychain = Keychain(testing=True)
+        kc.delete_all_keys()
+
+        mnemonic = generate_mnemonic()
+        entropy = bytes_from_mnemonic(mnemonic)
+        key = AugSchemeMPL.key_gen(mnemonic_to_seed(mnemonic, ""))
+        keyring.set_password(
+            kc._get_service(), kc._get_private_key_user(0), _encode_key_str(bytes(key.get_g1()), entropy)
+        )
+
+        assert kc.get_first_public_key() == key.get_g1()
+        assert kc.get_first_private_key() == (key, entropy)
+
+        # New entries are still written as hex, alongside the base64 one
+        kc.add_private_key(generate_mnemonic(), "")
+        assert kc._get_free_private_key_index() == 2
+        assert len(kc.get_all_private_keys()) == 2
+
+        kc.delete_key_by_fingerprint(key.get_g1().get_fingerprint())
+        assert len(kc.get_all_public_keys()) == 1
+        kc.delete_all_keys()
+
     def test_bip39_eip2333_test_vector(self):
         kc: Keychain = Keychain(testing=True)
         kc.delete_all_keys()